@@ -1,15 +1,138 @@
 # Bottom row: sum of first n natural numbers
 # > solution(x, 1) := x * (x+1) / 2
+#
+# Inverse: the ID falls in the first diagonal d with d * (d+1) / 2 >= ID,
+# which an integer square root gives exactly, for IDs of any size.
+from itertools import islice
 
-def solution(x, y):
+try:
+    import numpy as np
+except ImportError:     # bulk conversions fall back to pure python
+    np = None
+
+try:
+    from math import isqrt
+except ImportError:     # Python < 3.8
+    def isqrt(n):
+        """Largest integer r such that r * r <= n (Newton's method)."""
+        if n < 0:
+            raise ValueError("isqrt() argument must be nonnegative")
+        if n == 0:
+            return 0
+        r = 1 << ((n.bit_length() + 1) // 2)
+        while True:
+            s = (r + n // r) // 2
+            if s >= r:
+                return r
+            r = s
+
+# Largest diagonal whose IDs all fit in int64 for the numpy engine
+# (d * (d+1) must stay below 2^63)
+MAX_NUMPY_DIAGONAL = 3 * 10 ** 9
+
+# Lines of an input file converted at a time by `convert_file`
+CHUNK_SIZE = 1 << 16
+
+
+def location_id(x, y):
+    """ID of the point (x, y), as an exact integer."""
     # Get index of diagonal (point at y=1 that belongs to the same diagonal)
     diagonal_idx = x + y - 1
 
     # ID of point at (1, diagonal_idx)
-    sum_natural_nums = diagonal_idx * (diagonal_idx + 1) / 2
+    sum_natural_nums = diagonal_idx * (diagonal_idx + 1) // 2
 
     # ID of point at (x, y) will be (sum_natural_nums - (diagonal_idx - x))
-    return str(sum_natural_nums - (diagonal_idx - x))   # Return must be type string
+    return sum_natural_nums - (diagonal_idx - x)
+
+def location_of(worker_id):
+    """Point (x, y) of an ID, inverse of `location_id`."""
+    if worker_id < 1:
+        raise ValueError("IDs start at 1: %d" % worker_id)
+
+    # Last diagonal whose IDs are all below worker_id:
+    # d * (d+1) / 2 <= worker_id - 1  <=>  (2d + 1)^2 <= 8 * worker_id - 7
+    previous_diagonal = (isqrt(8 * worker_id - 7) - 1) // 2
+    x = worker_id - previous_diagonal * (previous_diagonal + 1) // 2
+    return x, previous_diagonal + 2 - x
+
+def location_ids(xs, ys):
+    """
+    IDs of the points (xs[i], ys[i]). With numpy arrays (and every diagonal
+    up to MAX_NUMPY_DIAGONAL) returns an int64 array, computed vectorized;
+    otherwise returns a lazy iterator of exact integers.
+    """
+    if np is not None and isinstance(xs, np.ndarray):
+        # Bound the coordinates first, so that their sum can't wrap around
+        if not len(xs) or (
+            xs.min() >= 1 and ys.min() >= 1
+            and xs.max() <= MAX_NUMPY_DIAGONAL and ys.max() <= MAX_NUMPY_DIAGONAL
+        ):
+            xs, ys = xs.astype(np.int64), ys.astype(np.int64)
+            diagonal_idx = xs + ys - 1
+            if not len(diagonal_idx) or diagonal_idx.max() <= MAX_NUMPY_DIAGONAL:
+                return diagonal_idx * (diagonal_idx + 1) // 2 - (diagonal_idx - xs)
+        xs, ys = xs.tolist(), ys.tolist()
+    return map(location_id, xs, ys)
+
+def locations(worker_ids):
+    """
+    Points of the IDs, inverse of `location_ids`: a (n, 2) int64 array for a
+    numpy array of IDs (in the int64 range of MAX_NUMPY_DIAGONAL), otherwise
+    a lazy iterator of (x, y) tuples.
+    """
+    if np is not None and isinstance(worker_ids, np.ndarray):
+        ids = worker_ids.astype(np.int64)
+        max_id = MAX_NUMPY_DIAGONAL * (MAX_NUMPY_DIAGONAL + 1) // 2
+        if not len(ids) or (ids.min() >= 1 and ids.max() <= max_id):
+            # Float square root, then exact correction of the diagonal
+            previous = ((np.sqrt(8.0 * ids - 7) - 1) // 2).astype(np.int64)
+            previous -= previous * (previous + 1) // 2 >= ids
+            previous += (previous + 1) * (previous + 2) // 2 < ids
+            x = ids - previous * (previous + 1) // 2
+            return np.stack((x, previous + 2 - x), axis=1)
+        worker_ids = worker_ids.tolist()
+    return map(location_of, worker_ids)
+
+def _chunks(lines, chunk_size):
+    """Consecutive lists of (at most) chunk_size lines."""
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def convert_file(src_path, dst_path, inverse=False, chunk_size=CHUNK_SIZE):
+    """
+    Streams a file of "x y" lines into a file of IDs, one per line (or
+    back, with inverse=True), chunk_size lines at a time, so files of any
+    length are converted in constant memory.
+    """
+    with open(src_path) as src, open(dst_path, "w") as dst:
+        for chunk in _chunks(src, chunk_size):
+            if np is not None:
+                try:
+                    values = np.array(" ".join(chunk).split(), dtype=np.int64)
+                except (OverflowError, ValueError):
+                    values = None   # Beyond int64: exact integers below
+                if values is not None:
+                    if inverse:
+                        results = locations(values)
+                    else:
+                        results = location_ids(values[0::2], values[1::2])
+                    if isinstance(results, np.ndarray):
+                        np.savetxt(dst, results, fmt="%d")
+                        continue
+
+            if inverse:
+                points = locations(int(line) for line in chunk)
+                dst.writelines("%d %d\n" % point for point in points)
+            else:
+                ids = (location_id(*map(int, line.split())) for line in chunk)
+                dst.writelines("%d\n" % worker_id for worker_id in ids)
+
+def solution(x, y):
+    return str(location_id(x, y))   # Return must be type string
 
 if __name__ == '__main__':
     print(solution(3, 2))
@@ -17,3 +140,33 @@ if __name__ == '__main__':
 
     print(solution(5, 10))
     # Output: 96
+
+    assert solution(100000, 100000) == "19999800001"
+    assert location_of(location_id(2 ** 60 + 3, 2 ** 70)) == (2 ** 60 + 3, 2 ** 70)
+    assert location_of(96) == (5, 10) and location_of(1) == (1, 1)
+    assert list(location_ids([3, 5], [2, 10])) == [9, 96]
+    assert list(locations([9, 96])) == [(3, 2), (5, 10)]
+
+    if np is not None:
+        xs, ys = np.array([3, 5, 1, 5 * 10 ** 18]), np.array([2, 10, 3 * 10 ** 9, 5 * 10 ** 18])
+        assert list(location_ids(xs[:3], ys[:3])) == [location_id(x, y) for x, y in zip([3, 5, 1], [2, 10, 3 * 10 ** 9])]
+        assert list(location_ids(xs, ys)) == [location_id(x, y) for x, y in zip(xs.tolist(), ys.tolist())]
+        ids = np.array([1, 9, 96, location_id(1, 3 * 10 ** 9)])
+        assert locations(ids).tolist() == [[1, 1], [3, 2], [5, 10], [1, 3 * 10 ** 9]]
+
+    # File round trip, x/y -> IDs -> x/y, across chunks beyond int64
+    import os, shutil, tempfile
+    points = [(3, 2), (5, 10), (1, 3 * 10 ** 9), (10 ** 20, 7), (2, 2)]
+    directory = tempfile.mkdtemp()
+    try:
+        paths = [os.path.join(directory, name) for name in ("xy", "ids", "back")]
+        with open(paths[0], "w") as points_file:
+            points_file.writelines("%d %d\n" % point for point in points)
+        convert_file(paths[0], paths[1], chunk_size=2)
+        convert_file(paths[1], paths[2], inverse=True, chunk_size=2)
+        with open(paths[1]) as ids_file:
+            assert [int(line) for line in ids_file] == [location_id(*point) for point in points]
+        with open(paths[2]) as back_file:
+            assert [tuple(map(int, line.split())) for line in back_file] == points
+    finally:
+        shutil.rmtree(directory)
@@ -1,31 +1,205 @@
-def numberToBase(n, b, l):
-    if n == 0:
-        return "".join(["0"] * l)
-    digits = ""
-    while n:
-        digits += str(int(n % b))
-        n //= b
+"""
+Each new ID is (digits sorted descending) - (digits sorted ascending), in
+base b, padded to the length k of the IDs. So the next ID only depends on
+the multiset of digits of the current one, and we can work on digit-count
+vectors instead of strings and integers:
 
-    # l controls the string length
-    filler_list = ["0"] * (l - len(digits))
-    return "".join(filler_list) + digits[::-1]
+- the sorted IDs x and y come straight from the counts of each digit;
+- z = x - y is computed digit by digit (with borrows), and its digits are
+counted into the next vector;
 
-def solution(n, b):
-    found_nums = []
-    num = n
+A digit-count vector is kept sparse, as a sorted tuple of (digit, count)
+pairs, so each step costs O(k) whatever the base. The cycle length of the
+IDs is the cycle length of their digit-count vectors.
+"""
+import struct
+from array import array
+from itertools import combinations
 
-    while num not in found_nums:
-        found_nums.append(num)
+try:
+    from math import comb as binomial
+except ImportError:  # Python < 3.8
+    def binomial(n, r):
+        if not 0 <= r <= n:
+            return 0
+        result = 1
+        for i in range(min(r, n - r)):
+            result = result * (n - i) // (i + 1)
+        return result
 
-        # Computing x and y
-        x = int("".join(sorted(num, reverse=True)), b)
-        y = int("".join(sorted(num)), b)
-        # Computing new n
-        num = numberToBase(x-y, b, len(n))
 
-    return len(found_nums) - found_nums.index(num)
+def digit_counts(n, b):
+    """
+    Digit-count vector of an ID, given as a string (digits up to base 36) or
+    as a sequence of int digits (any base).
+    """
+    counts = {}
+    for digit in n:
+        if not isinstance(digit, int):
+            digit = int(digit, 36)
+        if not 0 <= digit < b:
+            raise ValueError("Digit %d out of base %d" % (digit, b))
+        counts[digit] = counts.get(digit, 0) + 1
+    return tuple(sorted(counts.items()))
+
+def next_counts(counts, b):
+    """Digit-count vector of the next ID, from the one of the current ID."""
+    # Digits of x (sorted descending), least significant first; the digits of
+    # y (sorted ascending) are the same ones, most significant first
+    ascending = []
+    for digit, count in counts:
+        ascending.extend([digit] * count)
+    k = len(ascending)
+
+    z_counts = {}
+    borrow = 0
+    for i in range(k):
+        digit = ascending[i] - ascending[k - 1 - i] - borrow
+        if digit < 0:
+            digit += b
+            borrow = 1
+        else:
+            borrow = 0
+        z_counts[digit] = z_counts.get(digit, 0) + 1
+    return tuple(sorted(z_counts.items()))
+
+def cycle_length_dict(counts, b):
+    """Cycle length, remembering the first step at which each vector was seen."""
+    first_seen = {}
+    step = 0
+    while counts not in first_seen:
+        first_seen[counts] = step
+        counts = next_counts(counts, b)
+        step += 1
+    return step - first_seen[counts]
+
+def cycle_length_brent(counts, b):
+    """Cycle length with Brent's algorithm, in O(1) memory."""
+    power = length = 1
+    tortoise = counts
+    hare = next_counts(counts, b)
+    while tortoise != hare:
+        if power == length:
+            tortoise = hare
+            power *= 2
+            length = 0
+        hare = next_counts(hare, b)
+        length += 1
+    return length
+
+
+class CycleTable:
+    """
+    Cycle length reached from every ID of length k in base b, for answering
+    huge batches of IDs without retracing their paths.
+
+    The map only depends on digit multisets, so the nodes of its functional
+    graph are the C(b + k - 1, k) multisets, not the b^k IDs. A multiset of
+    sorted digits d_0 <= ... <= d_(k-1) is indexed by the colex rank of the
+    k-combination c_i = d_i + i, so a lookup is O(k). The successor of every
+    node is computed once, and every node is labelled with the length of
+    the cycle it ends up in by an iterative pass over the graph.
+    """
+    FILE_MAGIC = b"IDCT"
+    FILE_HEADER = struct.Struct("<4sIII")   # magic, k, b, number of nodes
+
+    def __init__(self, k, b, labels=None):
+        self.k, self.b = k, b
+        # binomials[i][c] = C(c, i + 1), the colex weight of c at position i
+        self.binomials = [
+            [binomial(c, i + 1) for c in range(b + k)] for i in range(k)
+        ]
+        self.num_nodes = binomial(b + k - 1, k)
+        self.labels = labels if labels is not None else self._build()
+
+    def rank(self, counts):
+        """Node index of a digit-count vector (see `digit_counts`)."""
+        rank = 0
+        i = 0
+        for digit, count in counts:
+            for _ in range(count):
+                rank += self.binomials[i][digit + i]
+                i += 1
+        return rank
+
+    def _build(self):
+        k, b = self.k, self.b
+        successors = array('l', [0]) * self.num_nodes
+        for combination in combinations(range(b + k - 1), k):
+            counts = {}
+            for i, c in enumerate(combination):
+                counts[c - i] = counts.get(c - i, 0) + 1
+            counts = tuple(sorted(counts.items()))
+            successors[self.rank(counts)] = self.rank(next_counts(counts, b))
+
+        # Functional graph pass: walk from each unvisited node until reaching
+        # a visited one; if it's on the current walk, a new cycle was found
+        labels = array('l', [0]) * self.num_nodes
+        state = bytearray(self.num_nodes)   # 0: new, 1: on current walk, 2: done
+        for start in range(self.num_nodes):
+            if state[start]:
+                continue
+            walk = []
+            node = start
+            while not state[node]:
+                state[node] = 1
+                walk.append(node)
+                node = successors[node]
+
+            if state[node] == 1:
+                cycle_start = walk.index(node)
+                label = len(walk) - cycle_start
+            else:
+                label = labels[node]
+            for node in walk:
+                labels[node] = label
+                state[node] = 2
+
+        return labels
+
+    def cycle_length(self, n):
+        """Same as `solution(n, b)`, for an ID of length k, in O(k)."""
+        if len(n) != self.k:
+            raise ValueError("ID length %d, expected %d" % (len(n), self.k))
+        return self.labels[self.rank(digit_counts(n, self.b))]
+
+    def save(self, path):
+        """Stores the labels as a compact array file (with a small header)."""
+        with open(path, "wb") as table_file:
+            table_file.write(self.FILE_HEADER.pack(self.FILE_MAGIC, self.k, self.b, self.num_nodes))
+            array('I', self.labels).tofile(table_file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as table_file:
+            magic, k, b, num_nodes = cls.FILE_HEADER.unpack(table_file.read(cls.FILE_HEADER.size))
+            if magic != cls.FILE_MAGIC:
+                raise ValueError("Not a cycle table file: %s" % path)
+            labels = array('I')
+            labels.fromfile(table_file, num_nodes)
+        return cls(k, b, labels)
+
+
+def solution(n, b, method="dict"):
+    """
+    Length of the cycle the ID n (in base b) ends up in. `method` is "dict"
+    (first-seen index of each step) or "brent" (constant memory).
+    """
+    counts = digit_counts(n, b)
+    if method == "dict":
+        return cycle_length_dict(counts, b)
+    elif method == "brent":
+        return cycle_length_brent(counts, b)
+    raise ValueError("Unknown cycle detection method: %s" % method)
 
 if __name__ == "__main__":
     assert solution("210022", 3) == 3
     assert solution("1211", 10) == 1
+    assert solution("210022", 3, method="brent") == 3
+    assert solution("1211", 10, method="brent") == 1
+
+    table = CycleTable(6, 3)
+    assert table.cycle_length("210022") == 3
+    assert CycleTable(4, 10).cycle_length("1211") == 1
+
     print("All tests passed")
@@ -1,32 +1,266 @@
+import os
+import mmap
+import sys
+import time
+from array import array
+from bisect import bisect_right
+
+try:
+	import numpy as np
+except ImportError:  # the batch engine falls back to pure python
+	np = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ion-flux-relabeling")
+TABLE_VERSION = 1
+
+# Parent tables hold 4-byte signed labels, so h <= 31
+TABLE_TYPECODE = 'i'
+MAX_TABLE_HEIGHT = 31
+TABLE_CHUNK = 1 << 16
+
+# The batch engine only pays off while the walks share a good part of
+# their prefixes: h <= BATCH_DEPTH_RATIO * log2(number of queries)
+BATCH_DEPTH_RATIO = 3
+
+# h -> memory-mapped parent table, see `load_parent_table`
+_parent_tables = {}
+
+
 def root_of_node(h, k):
-	# Start at root
-	root_of_current = -1
-	current_node = 2 ** h - 1
-	current_h = h
+	"""
+	Parent of node k, in a perfect binary tree of height h labelled in
+	post-order: walk down from the root, in O(h), halving the subtree size
+	with shifts. Returns -1 for the root (and for labels not in the tree).
+	"""
+	current_node = (1 << h) - 1
+	if not 1 <= k <= current_node:
+		return -1
+
+	# Size of each child subtree, plus one: left child = current - half
+	return _walk(k, current_node, 1 << (h - 1), -1)
 
-	while current_node != k:
-		current_h -= 1
-		# Take left path or right path?
-		left_child = current_node - (2 ** current_h)
-		right_child = current_node - 1
 
+def _walk(k, current_node, half, root_of_current):
+	"""Walk down to k from current_node, whose child subtrees have size half - 1."""
+	while current_node != k:
 		root_of_current = current_node
-		if k <= left_child:
-			current_node = left_child
+		if k <= current_node - half:
+			current_node -= half
 		else:
-			current_node = right_child
+			current_node -= 1
+		half >>= 1
 
 	return root_of_current
 
 
-def solution(h, q):
-	return [root_of_node(h, k) for k in q]
+def parents_batch(h, q):
+	"""
+	Parents of all labels in q at once: sort the queries, and descend the
+	tree a single time, splitting the sorted queries between the left and
+	right subtrees at each node, so shared prefixes of the walks are only
+	taken once. Returns the parents in the order of q.
+	"""
+	root = (1 << h) - 1
+	parents = [-1] * len(q)
+	order = sorted((idx for idx, k in enumerate(q) if 1 <= k <= root), key=q.__getitem__)
+	labels = [q[idx] for idx in order]
+
+	# (queries [lo, hi) in the subtree, subtree root, child size + 1, parent)
+	stack = [(0, len(labels), root, 1 << (h - 1), -1)]
+	while stack:
+		lo, hi, node, half, parent = stack.pop()
+
+		# Nothing left to share: finish the walk of a single label
+		if hi - lo == 1:
+			parents[order[lo]] = _walk(labels[lo], node, half, parent)
+			continue
+
+		# The subtree root is its largest label
+		while hi > lo and labels[hi - 1] == node:
+			hi -= 1
+			parents[order[hi]] = parent
+		if hi == lo:
+			continue
+
+		mid = bisect_right(labels, node - half, lo, hi)
+		if mid > lo:
+			stack.append((lo, mid, node - half, half >> 1, node))
+		if hi > mid:
+			stack.append((mid, hi, node - 1, half >> 1, node))
+
+	return parents
+
+
+def parents_numpy(h, q):
+	"""
+	Same as `parents_batch`, vectorized with numpy int64 arrays: all labels
+	walk down the tree together, one level per iteration (h <= 62).
+	"""
+	if h > 62:
+		raise ValueError("The numpy engine only supports h <= 62")
+
+	labels = np.asarray(q, dtype=np.int64)
+	current = np.full(labels.shape, (1 << h) - 1, dtype=np.int64)
+	parents = np.full(labels.shape, -1, dtype=np.int64)
+	active = (labels >= 1) & (labels < current)
+
+	half = 1 << (h - 1)
+	while half and active.any():
+		go_left = labels <= current - half
+		next_node = np.where(go_left, current - half, current - 1)
+		found = active & (next_node == labels)
+		parents[found] = current[found]
+		current = np.where(active, next_node, current)
+		active &= ~found
+		half >>= 1
+
+	return parents.tolist()
+
+
+def parent_table_path(h, cache_dir=None):
+	"""Path of the cached parent table of a height, in a versioned cache directory."""
+	return os.path.join(
+		cache_dir or DEFAULT_CACHE_DIR,
+		"v%d" % TABLE_VERSION,
+		"parents-h%02d-%s.bin" % (h, sys.byteorder),
+	)
+
+
+def store_parent_table(h, cache_dir=None):
+	"""
+	Writes (atomically) the parent of every label of the tree of height h
+	to the cache, as a flat array indexed by label (parents[0] = -1).
+	The table is built in place in the memory-mapped file, by doubling:
+	the tree of height hh is two copies of the tree of height hh - 1, the
+	second one shifted by its size, under a new root.
+	"""
+	if not 1 <= h <= MAX_TABLE_HEIGHT:
+		raise ValueError("Parent tables are only built for 1 <= h <= %d" % MAX_TABLE_HEIGHT)
+
+	path = parent_table_path(h, cache_dir)
+	directory = os.path.dirname(path)
+	if not os.path.isdir(directory):
+		try:
+			os.makedirs(directory)
+		except OSError:		# Created concurrently by another process
+			if not os.path.isdir(directory):
+				raise
+
+	tmp_path = "%s.%d.tmp" % (path, os.getpid())
+	with open(tmp_path, "w+b") as table_file:
+		table_file.truncate(array(TABLE_TYPECODE).itemsize << h)
+		data = mmap.mmap(table_file.fileno(), 0)
+		parents = memoryview(data).cast(TABLE_TYPECODE)
+
+		parents[0] = parents[1] = -1
+		for height in range(2, h + 1):
+			size = (1 << (height - 1)) - 1	# Of each subtree
+			root = 2 * size + 1
+			parents[size] = root
+			for start in range(1, size + 1, TABLE_CHUNK):
+				end = min(start + TABLE_CHUNK, size + 1)
+				parents[start + size:end + size] = array(TABLE_TYPECODE, map(size.__add__, parents[start:end]))
+			parents[2 * size] = root
+			parents[root] = -1
+
+		parents.release()
+		data.close()
+	os.rename(tmp_path, path)
+	return path
+
+
+def load_parent_table(h, cache_dir=None):
+	"""
+	Loads the parent table of height h from the cache (building and storing
+	it first if it isn't there), memory-mapped read-only, so the pages are
+	shared by every process using it.
+	"""
+	if h in _parent_tables:
+		return _parent_tables[h]
+
+	path = parent_table_path(h, cache_dir)
+	if not os.path.exists(path):
+		store_parent_table(h, cache_dir)
+
+	with open(path, "rb") as table_file:
+		data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+	parents = memoryview(data).cast(TABLE_TYPECODE)
+	if len(parents) != 1 << h:
+		raise ValueError("Invalid ion flux table cache file: %s" % path)
+
+	_parent_tables[h] = parents
+	return parents
+
+
+def parents_table(h, q, cache_dir=None):
+	"""Parents of all labels in q, one lookup each in the cached table of h."""
+	parents = load_parent_table(h, cache_dir)
+	size = len(parents)
+	return [parents[k] if 0 <= k < size else -1 for k in q]
+
+
+def report_parent_table(h, cache_dir=None):
+	"""
+	Builds the parent table of height h, and returns (build seconds, table
+	bytes, peak resident memory in bytes or None if unknown).
+	"""
+	start = time.time()
+	path = store_parent_table(h, cache_dir)
+	elapsed = time.time() - start
+
+	try:
+		import resource
+		peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		peak_rss *= 1 if sys.platform == "darwin" else 1024
+	except ImportError:
+		peak_rss = None
+	return elapsed, os.path.getsize(path), peak_rss
+
+
+def solution(h, q, engine="auto", cache_dir=None):
+	"""
+	Parent of each label in q, with engine "batch" (sorted single descent),
+	"numpy" (vectorized, h <= 62), "table" (lookups in the cached parent
+	table, h <= 31) or "walk" (one walk per label). "auto" picks "batch"
+	for many queries on a shallow tree (see BATCH_DEPTH_RATIO), and "walk"
+	otherwise.
+	"""
+	if engine == "auto":
+		engine = "batch" if h <= BATCH_DEPTH_RATIO * len(q).bit_length() else "walk"
+
+	if engine == "batch":
+		return parents_batch(h, q)
+	elif engine == "table":
+		return parents_table(h, q, cache_dir)
+	elif engine == "numpy":
+		return parents_numpy(h, q)
+	elif engine == "walk":
+		return [root_of_node(h, k) for k in q]
+	raise ValueError("Unknown engine: %s" % engine)
 
 
 if __name__ == '__main__':
-	
+	if sys.argv[1:2] == ["build-table"]:
+		# python solution.py build-table H [CACHE_DIR]
+		h = int(sys.argv[2])
+		elapsed, table_bytes, peak_rss = report_parent_table(h, sys.argv[3] if len(sys.argv) > 3 else None)
+		print("h=%d: built in %.2fs, table %d bytes, peak rss %s bytes" % (h, elapsed, table_bytes, peak_rss))
+		sys.exit()
+
 	print(solution(5, [19, 14, 28]))
 	# Output: 21,15,29
 
 	print(solution(3, [7, 3, 5, 1]))
 	# Output: -1,7,6,3
+
+	assert solution(5, [19, 14, 28], engine="walk") == [21, 15, 29]
+	assert solution(3, [7, 3, 5, 1, 3], engine="batch") == [-1, 7, 6, 3, 7]
+	assert solution(3, [7, 3, 5, 1, 3]) == [-1, 7, 6, 3, 7]
+
+	import shutil
+	import tempfile
+	cache_dir = tempfile.mkdtemp()
+	try:
+		assert solution(5, [19, 14, 28, 31, 0, 32], engine="table", cache_dir=cache_dir) == [21, 15, 29, -1, -1, -1]
+	finally:
+		shutil.rmtree(cache_dir)
@@ -1,18 +1,43 @@
+# Bits of the leading parts of M and F on which `lehmer_quotient_sum` runs
+# its single-precision Euclid steps (at least; it grows with the inputs)
+LEHMER_BITS = 64
 
-def solution(M, F):
+# Decimal strings longer than this are parsed by splitting them in halves
+# (Python >= 3.11 refuses to parse more than 4300 digits at once)
+PARSE_DIGITS = 4000
+
+
+def parse_count(digits):
     """
-    Each bomb can generate one of the other type of bomb, so
-    they're **interchangeable**.
+    Integer value of a decimal string of any length: the two halves are
+    parsed recursively and recombined, which is also subquadratic.
+    """
+    if len(digits) <= PARSE_DIGITS:
+        return int(digits)
+    half = len(digits) // 2
+    low_digits = len(digits) - half
+    return parse_count(digits[:half]) * 10 ** low_digits + parse_count(digits[half:])
 
-    Start from the end-point (number of bombs required), and
-    work backwards until reaching the starting point of (1, 1).
 
-    Find the bomb with largest gap between target and current
-    (M > F ? M : F), and produce (remove from target, working
-    backwords).
+def format_count(n):
     """
-    M, F = int(M), int(F)
+    Decimal string of an integer of any size, inverse of `parse_count`: the
+    number is split in a high and a low half of its digits, formatted
+    recursively.
+    """
+    # Upper bound of the number of digits (log10(2) < 0.30103)
+    digits = int(n.bit_length() * 0.30103) + 1
+    if digits <= PARSE_DIGITS:
+        return str(n)
+    low_digits = digits // 2
+    high, low = divmod(n, 10 ** low_digits)
+    return format_count(high) + format_count(low).zfill(low_digits)
+
 
+def euclid_quotient_sum(M, F):
+    """
+    Sum of the quotients of the Euclid algorithm on (M, F), and their gcd.
+    """
     # Bomb types are interchangeable
     if M < F:
         M, F = F, M
@@ -33,7 +58,100 @@ def solution(M, F):
         if M <= 0 or F <= 0:
             break
 
-    return str(cnt-1) if M == 1 else "impossible"
+    return cnt, M
+
+
+def lehmer_quotient_sum(M, F):
+    """
+    Same as `euclid_quotient_sum`, with Lehmer's algorithm (Knuth, TAOCP
+    vol. 2, 4.5.2, Algorithm L): the quotients are computed on the leading
+    bits of both numbers only, for as long as they are provably the same as
+    the quotients of the full numbers, and their combined effect (a 2x2
+    cofactor matrix) is then applied to the full numbers at once.
+    """
+    if M < F:
+        M, F = F, M
+    if M == F:
+        return 0, M
+
+    cnt = 0
+    while F:
+        # Leading bits of M, and the bits of F aligned with them
+        precision = max(LEHMER_BITS, M.bit_length() // 64)
+        shift = M.bit_length() - precision
+        if shift <= 0:
+            q, r = divmod(M, F)
+            cnt += q
+            M, F = F, r
+            continue
+
+        x, y = M >> shift, F >> shift
+        A, B, C, D = 1, 0, 0, 1
+        # M / F lies between (x + A) / (y + C) and (x + B) / (y + D)
+        while y + C and y + D:
+            q = (x + A) // (y + C)
+            if q != (x + B) // (y + D):
+                break
+            cnt += q
+            A, C = C, A - q * C
+            B, D = D, B - q * D
+            x, y = y, x - q * y
+
+        if B:
+            M, F = A * M + B * F, C * M + D * F
+        else:
+            # Not even one quotient is known: a full-precision step
+            q, r = divmod(M, F)
+            cnt += q
+            M, F = F, r
+
+    return cnt, M
+
+
+ENGINES = {
+    "euclid": euclid_quotient_sum,
+    "lehmer": lehmer_quotient_sum,
+}
+
+
+def solution(M, F, engine="euclid"):
+    """
+    Each bomb can generate one of the other type of bomb, so
+    they're **interchangeable**.
+
+    Start from the end-point (number of bombs required), and
+    work backwards until reaching the starting point of (1, 1).
+
+    Find the bomb with largest gap between target and current
+    (M > F ? M : F), and produce (remove from target, working
+    backwords).
+    """
+    cnt, gcd = ENGINES[engine](parse_count(M), parse_count(F))
+    return format_count(cnt-1) if gcd == 1 else "impossible"
+
+
+def solve_pair(line):
+    """`solution` for a line "M F" of a batch file, with the Lehmer engine."""
+    M, F = line.split()
+    return solution(M, F, engine="lehmer")
+
+
+def solve_file(path, processes=None, chunksize=1):
+    """
+    Solves every line "M F" of a file over a process pool, and yields the
+    answers in the order of the file.
+    """
+    from multiprocessing import Pool, cpu_count
+
+    pool = Pool(processes or cpu_count())
+    try:
+        with open(path) as pairs:
+            lines = (line for line in pairs if line.strip())
+            for answer in pool.imap(solve_pair, lines, chunksize):
+                yield answer
+    finally:
+        pool.close()
+        pool.join()
 
 
 if __name__ == "__main__":
@@ -45,3 +163,17 @@ if __name__ == "__main__":
 
     print(solution("2", "4"))
     # Output: impossible
+
+    for M, F in [("4", "7"), ("2", "1"), ("2", "4"), ("1", "1"), (str(3 ** 500), str(2 ** 700))]:
+        assert solution(M, F, engine="lehmer") == solution(M, F)
+    assert solution("1" + "0" * 5000, "3", engine="lehmer") == "3" * 4999 + "5"
+
+    # Batch file over a pool of 2 processes: blank lines skipped, file order kept
+    import os, tempfile
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, "w") as pairs:
+            pairs.write("4 7\n2 1\n\n2 4\n")
+        assert list(solve_file(path, processes=2)) == ["4", "1", "impossible"]
+    finally:
+        os.remove(path)
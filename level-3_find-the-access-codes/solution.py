@@ -1,4 +1,10 @@
-def solution(l):
+import json
+import os
+import sys
+from array import array
+
+
+def count_triples_pairwise(l):
     # Since we must also be able to deal with repeated values in l,
     # our 'doubles' dict will be in the format 'num: [(idx in l, count)]'
     doubles = dict()
@@ -29,8 +35,177 @@ def solution(l):
     return triples
 
 
+def smallest_prime_factors(limit):
+    """
+    Sieve of the smallest prime factor of every number up to limit, as a
+    flat array('i'). Primes up to sqrt(limit) are marked from the largest
+    to the smallest, so the smallest prime factor is the one that sticks.
+    """
+    spf = array('i', range(limit + 1))
+    root = int(limit ** 0.5)
+    while root * root > limit:
+        root -= 1
+
+    small_primes = [p for p in range(2, root + 1) if all(p % q for q in range(2, int(p ** 0.5) + 1))]
+    for p in reversed(small_primes):
+        spf[p * p::p] = array('i', [p]) * len(range(p * p, limit + 1, p))
+    return spf
+
+def divisors(x, spf):
+    """All divisors of x, built from its factorization via the spf sieve."""
+    divs = [1]
+    while x > 1:
+        p = spf[x]
+        exponent = 0
+        while x % p == 0:
+            x //= p
+            exponent += 1
+        prime_power_divs = divs
+        for _ in range(exponent):
+            prime_power_divs = [d * p for d in prime_power_divs]
+            divs = divs + prime_power_divs
+    return divs
+
+def count_triples_divisors(l):
+    """
+    Counts the triples in O(max(l) + n * d), where d is the number of
+    divisors of a value (at most 240 below 10^6), instead of O(n^2).
+
+    A triple (i, j, k) is counted at its middle element j: it's the number
+    of earlier elements dividing l[j] times the number of later elements
+    that l[j] divides. Both are found by walking the divisors of each value
+    against flat arrays of counts indexed by value:
+    - left to right, `seen[d]` counts the earlier occurrences of value d;
+    - right to left, `later[d]` counts the later values that d divides;
+    """
+    spf = smallest_prime_factors(max(l))
+    seen = array('q', [0]) * (len(spf))
+    later = array('q', [0]) * (len(spf))
+
+    # Number of earlier elements dividing each element (the 'doubles')
+    doubles = array('q', [0]) * len(l)
+    for j, value in enumerate(l):
+        doubles[j] = sum([seen[d] for d in divisors(value, spf)])
+        seen[value] += 1
+
+    triples = 0
+    for j in range(len(l) - 1, -1, -1):
+        value = l[j]
+        triples += doubles[j] * later[value]
+        for d in divisors(value, spf):
+            later[d] += 1
+
+    return triples
+
+
+class LuckyTripleCounter:
+    """
+    Online version of the triple count, for lists that arrive as a stream.
+
+    Besides the running count, it keeps, indexed by value, flat arrays with
+    the number of occurrences of each value (`seen`) and the sum of the
+    'doubles' of those occurrences (`double_sums`), where the doubles of an
+    element are the number of earlier elements dividing it (also kept per
+    element, in `doubles`). A new element x closes a triple with every
+    earlier double ending in a divisor of x, so `append` only walks the
+    divisors of x: O(d) instead of O(n).
+    """
+    CHECKPOINT_VERSION = 1
+
+    def __init__(self, limit=1):
+        self.triples = 0
+        self.doubles = array('q')
+        self.spf = smallest_prime_factors(limit)
+        self.seen = array('q', [0]) * (limit + 1)
+        self.double_sums = array('q', [0]) * (limit + 1)
+
+    def _grow(self, limit):
+        """Sieves, and grows the value-indexed arrays, up to limit."""
+        self.spf = smallest_prime_factors(limit)
+        padding = array('q', [0]) * (limit + 1 - len(self.seen))
+        self.seen.extend(padding)
+        self.double_sums.extend(padding)
+
+    def append(self, x):
+        """Adds x at the end of the list, and returns the new triple count."""
+        if x >= len(self.spf):
+            self._grow(max(x, 2 * (len(self.spf) - 1)))
+
+        divs = divisors(x, self.spf)
+        seen, double_sums = self.seen, self.double_sums
+        self.triples += sum([double_sums[d] for d in divs])
+        doubles = sum([seen[d] for d in divs])
+
+        self.doubles.append(doubles)
+        seen[x] += 1
+        double_sums[x] += doubles
+        return self.triples
+
+    def extend(self, values):
+        for x in values:
+            self.append(x)
+        return self.triples
+
+    def checkpoint(self, path):
+        """
+        Saves the counter to `path` (atomically): a one-line JSON header,
+        followed by the raw `seen`, `double_sums` and `doubles` arrays.
+        """
+        header = {
+            "version": self.CHECKPOINT_VERSION,
+            "byteorder": sys.byteorder,
+            "itemsize": self.seen.itemsize,
+            "limit": len(self.seen) - 1,
+            "length": len(self.doubles),
+            "triples": self.triples,
+        }
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp_path, "wb") as checkpoint_file:
+            checkpoint_file.write((json.dumps(header) + "\n").encode("ascii"))
+            self.seen.tofile(checkpoint_file)
+            self.double_sums.tofile(checkpoint_file)
+            self.doubles.tofile(checkpoint_file)
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def restore(cls, path):
+        """Loads a counter saved with `checkpoint`."""
+        with open(path, "rb") as checkpoint_file:
+            header = json.loads(checkpoint_file.readline().decode("ascii"))
+            if (header["version"], header["byteorder"], header["itemsize"]) != (
+                cls.CHECKPOINT_VERSION, sys.byteorder, array('q').itemsize
+            ):
+                raise ValueError("Incompatible checkpoint: %s" % path)
+
+            counter = cls(header["limit"])
+            counter.triples = header["triples"]
+            counter.seen = array('q')
+            counter.seen.fromfile(checkpoint_file, header["limit"] + 1)
+            counter.double_sums = array('q')
+            counter.double_sums.fromfile(checkpoint_file, header["limit"] + 1)
+            counter.doubles.fromfile(checkpoint_file, header["length"])
+        return counter
+
+
+def solution(l):
+    # The divisor walk pays for sieving up to max(l), so it only pays off
+    # once the O(n^2) pairs outnumber the values
+    if len(l) < 3:
+        return 0
+    if len(l) ** 2 <= max(l):
+        return count_triples_pairwise(l)
+    return count_triples_divisors(l)
+
+
 if __name__ == "__main__":
     assert solution([1, 2, 3, 4, 5, 6]) == 3
     assert solution([1, 1, 1]) == 1
+    assert count_triples_divisors([1, 2, 3, 4, 5, 6]) == 3
+    assert count_triples_divisors([1, 1, 1]) == 1
+    assert count_triples_divisors([6, 2, 1, 4, 8, 8, 2]) == count_triples_pairwise([6, 2, 1, 4, 8, 8, 2])
+
+    counter = LuckyTripleCounter()
+    assert [counter.append(x) for x in [1, 2, 3, 4, 5, 6]] == [0, 0, 0, 1, 1, 3]
+    assert list(counter.doubles) == [0, 1, 1, 2, 1, 3]
 
     print("All tests passed")
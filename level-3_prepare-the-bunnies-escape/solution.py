@@ -1,118 +1,200 @@
-import heapq
+from array import array
+from collections import OrderedDict
 
+OPEN = 0
 WALL = 1
+OUTSIDE = 2  # Border around the map, so neighbours never need bounds checks
 
-class PriorityQueue:
+
+def padded_grid(map):
     """
-    This is a priority queue where we will store our matrix positions to be checked.
+    Flattens the map into a bytearray with a border of OUTSIDE cells around
+    it; cell (row, col) of the map is at index (row + 1) * width + (col + 1),
+    where width is the padded width. Returns (cells, width).
     """
-    def __init__(self):
-        self.elements = []
-
-    def empty(self):
-        return not self.elements
-
-    def put(self, item, priority):
-        heapq.heappush(self.elements, (priority, item))
-
-    def get(self):
-        return heapq.heappop(self.elements)[1]
-
-class Path:
-    def __init__(self, pos, removed_wall):
-        self.pos = pos
-        self.removed_wall = removed_wall
-
-    def get_neighbours(self, map):
-        x, y = self.pos
-        neighbours = []
-
-        # Verify move left
-        if x - 1 >= 0:
-            if map[x - 1][y] != WALL:
-                neighbours.append(Path((x-1,y), self.removed_wall))
-            elif not self.removed_wall:
-                neighbours.append(Path((x-1,y), True))
-
-        # Verify move right
-        if x + 1 < len(map):
-            if map[x + 1][y] != WALL:
-                neighbours.append(Path((x+1,y), self.removed_wall))
-            elif not self.removed_wall:
-                neighbours.append(Path((x+1,y), True))
-
-        # Verify move down
-        if y - 1 >= 0:
-            if map[x][y - 1] != WALL:
-                neighbours.append(Path((x,y-1), self.removed_wall))
-            elif not self.removed_wall:
-                neighbours.append(Path((x,y-1), True))
-
-        # Verify move up
-        if y + 1 < len(map[0]):
-            if map[x][y + 1] != WALL:
-                neighbours.append(Path((x,y+1), self.removed_wall))
-            elif not self.removed_wall:
-                neighbours.append(Path((x,y+1), True))
-
-        return neighbours
-
-    def __str__(self):
-        return str(self.pos) + str(self.removed_wall)
-
-    def __lt__(self, _):
-        # We give priority to paths without the wall removed
-        return not self.removed_wall
-
-
-def heuristic(current_pos, end_pos):
+    height, width = len(map), len(map[0]) + 2
+    cells = bytearray([OUTSIDE]) * ((height + 2) * width)
+    for row, values in enumerate(map):
+        start = (row + 1) * width + 1
+        cells[start:start + width - 2] = bytearray(values)
+    return cells, width
+
+
+def distance_field(cells, width, start, k=1, stop_at=None):
     """
-    Calculate an heuristics based on the current positions and the end position
+    Breadth-first search over the states (cell, walls_removed), where up to
+    k walls may be removed: all moves have unit cost, so the first time a
+    cell is reached is its shortest path from start.
+
+    The search goes one distance level at a time, and a state is pruned if
+    its cell was already reached with as few walls removed (BFS order means
+    that was at an equal or smaller distance). So the only per-cell data is
+    the fewest walls removed to reach it, and each cell is expanded at most
+    k + 1 times. States are flat integers, walls_removed * size + cell, kept
+    in `array('i')` frontiers.
+
+    Parameters
+    ----------
+    cells, width :
+        Padded grid, as returned by `padded_grid`.
+    start : int
+        Index of the start cell.
+    k : int, optional
+        Maximum number of walls that may be removed.
+    stop_at : int, optional
+        Stop the search as soon as this cell is reached.
+
+    Returns
+    -------
+    array('i')
+        Path length (counting both ends) from start to each cell, with at
+        most k walls removed; 0 for unreachable (or not yet reached) cells.
     """
-    x_start, y_start = current_pos
-    x_end, y_end = end_pos
+    size = len(cells)
+    offsets = (-1, 1, -width, width)
+
+    dist = array('i', [0]) * size
+    dist[start] = 1
+    if start == stop_at:
+        return dist
+
+    # Fewest walls removed to reach each cell so far (k + 1: not reached)
+    min_walls = array('B' if k < 255 else 'i', [k + 1]) * size
+    min_walls[start] = 0
+    frontier = array('i', [start])
+    path_len = 1
+
+    while frontier:
+        path_len += 1
+        next_frontier = array('i')
+
+        for state in frontier:
+            walls, cell = divmod(state, size)
 
-    # The closer the distance, the smaller the heuristic value
-    return (x_end - x_start) + (y_end - y_start)
+            for offset in offsets:
+                neighbour = cell + offset
+                kind = cells[neighbour]
+                if kind == OPEN:
+                    next_walls = walls
+                elif kind == WALL and walls < k:
+                    next_walls = walls + 1
+                else:
+                    continue
 
+                if next_walls < min_walls[neighbour]:
+                    if not dist[neighbour]:
+                        dist[neighbour] = path_len
+                        if neighbour == stop_at:
+                            return dist
+                    min_walls[neighbour] = next_walls
+                    next_frontier.append(next_walls * size + neighbour)
 
-def solution(map):
+        frontier = next_frontier
+
+    return dist
+
+
+class EscapeMap:
     """
-    This is basically the implementation of an A* algorithm where we allow
-    removing a wall once per each possible path.
+    A static map that answers many shortest path queries, between any two
+    cells, from BFS distance fields (see `distance_field`).
+
+    Fields are computed lazily, per (anchor cell, walls removed), and kept in
+    an LRU cache bounded by `cache_bytes`. A query is answered in O(1) when
+    the field of either end is cached; with one wall removal it can also be
+    combined in O(cells) from the wall-free fields of both ends.
     """
-    end_pos = (len(map) - 1, len(map[0])- 1)
-    map_heuristic = lambda current_pos: heuristic(
-        current_pos, end_pos
-    )
-    queue = PriorityQueue()
-    begin = Path((0,0), False)
-    queue.put(begin, 0)
+    def __init__(self, map, cache_bytes=64 * 1024 * 1024):
+        self.height, self.width = len(map), len(map[0])
+        self.cells, self.padded_width = padded_grid(map)
+        self.walls = array('i', [idx for idx, kind in enumerate(self.cells) if kind == WALL])
+        self.cache_bytes = cache_bytes
+        self.cached_bytes = 0
+        self._fields = OrderedDict()    # (anchor, k) -> distance field
+
+    def _index(self, pos):
+        row, col = pos
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            raise ValueError("Position out of the map: %s" % (pos, ))
+        return (row + 1) * self.padded_width + col + 1
 
-    # Stores the costs to get to each map position, while considering having
-    # removed a wall or not
-    cost = dict()
-    cost[str(begin)] = 1
+    def _cached_field(self, anchor, k):
+        field = self._fields.pop((anchor, k), None)
+        if field is not None:
+            self._fields[(anchor, k)] = field   # Most recently used
+        return field
 
-    while not queue.empty():
+    def _field(self, anchor, k):
+        field = self._cached_field(anchor, k)
+        if field is None:
+            field = distance_field(self.cells, self.padded_width, anchor, k)
+            self._fields[(anchor, k)] = field
+            self.cached_bytes += len(field) * field.itemsize
 
-        current = queue.get()
+            # Evict least recently used fields
+            while self.cached_bytes > self.cache_bytes and len(self._fields) > 1:
+                _, evicted = self._fields.popitem(last=False)
+                self.cached_bytes -= len(evicted) * evicted.itemsize
+        return field
 
-        if current.pos == end_pos:
-            break
+    def distance_field(self, anchor, k=1):
+        """
+        Returns the path lengths from `anchor` (row, col) to every cell, with
+        at most k walls removed, as a flat array indexed by padded cell index.
+        """
+        return self._field(self._index(anchor), k)
 
-        for path in current.get_neighbours(map):
-            new_cost = cost[str(current)] + 1
+    def shortest_path(self, source=(0, 0), target=None, k=1):
+        """
+        Length of the shortest path from source to target (the bottom right
+        corner by default), counting both ends, removing at most k walls.
+        """
+        if target is None:
+            target = (self.height - 1, self.width - 1)
+        src, dst = self._index(source), self._index(target)
 
-            if str(path) not in cost or new_cost < cost[str(path)]:
-                cost[str(path)] = new_cost
-                queue.put(path, new_cost + map_heuristic(path.pos))
+        # Paths are reversible, and can be combined from wall-free fields,
+        # only as long as both ends are passable: a wall at an end is
+        # removed by the field anchored at the source only
+        both_open = self.cells[src] == OPEN and self.cells[dst] == OPEN
+        field = self._cached_field(src, k)
+        if field is None and both_open:
+            field = self._cached_field(dst, k)
+            src, dst = dst, src
 
-    # Get the minimum between getting there by destroying a wall or not
-    return min(
-        cost.get(str(Path(end_pos, True)), float("inf")),
-        cost.get(str(Path(end_pos, False)), float("inf"))
-    )
+        if field is None and k == 1 and both_open:
+            from_src, from_dst = self._cached_field(src, 0), self._cached_field(dst, 0)
+            if from_src is not None and from_dst is not None:
+                return self._combine_one_wall(from_src, from_dst, dst)
+
+        if field is None:
+            field = self._field(src, k)
+        return field[dst] or float("inf")
+
+    def _combine_one_wall(self, from_src, from_dst, dst):
+        """
+        Shortest path removing at most one wall, from the wall-free fields of
+        both ends: the best of the wall-free path, and the best path through
+        each wall (reached from one neighbour, and left through another).
+        """
+        inf = float("inf")
+        best = from_src[dst] or inf
+        neighbour_offsets = (-1, 1, -self.padded_width, self.padded_width)
+        for wall in self.walls:
+            to_wall = min(from_src[wall + offset] or inf for offset in neighbour_offsets)
+            from_wall = min(from_dst[wall + offset] or inf for offset in neighbour_offsets)
+            best = min(best, to_wall + 1 + from_wall)
+        return best
+
+
+def solution(map, k=1):
+    """
+    Shortest path from the top left to the bottom right corner, counting
+    both ends, where up to k walls may be removed (see `distance_field`).
+    """
+    cells, width = padded_grid(map)
+    end = len(map) * width + len(map[0])
+    return distance_field(cells, width, width + 1, k, stop_at=end)[end] or float("inf")
 
 if __name__ == "__main__":
     assert solution([
@@ -131,4 +213,54 @@ if __name__ == "__main__":
             [0, 0, 0, 0, 0, 0]
         ]) == 11
 
+    # Without removing walls, or removing more of them
+    assert solution([
+            [0, 0, 0, 0, 0, 0],
+            [1, 1, 1, 1, 1, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 1, 1, 1, 1, 1],
+            [0, 1, 1, 1, 1, 1],
+            [0, 0, 0, 0, 0, 0]
+        ], k=0) == 21
+    assert solution([
+            [0, 1, 1, 0],
+            [0, 0, 0, 1],
+            [1, 1, 0, 0],
+            [1, 1, 1, 0]
+        ], k=2) == 7
+    assert solution([
+            [0, 1, 1, 1],
+            [1, 1, 1, 1],
+            [1, 1, 1, 1],
+            [1, 1, 1, 0]
+        ], k=5) == 7
+
+    grid = [
+        [0, 1, 1, 0],
+        [0, 0, 0, 1],
+        [1, 1, 0, 0],
+        [1, 1, 1, 0]
+    ]
+    escape_map = EscapeMap(grid)
+    assert escape_map.shortest_path() == 7
+    assert escape_map.shortest_path((3, 3), (0, 0), k=0) == 7
+    assert escape_map.shortest_path((0, 0), (0, 3)) == 6
+    assert escape_map.shortest_path((0, 3), (0, 0), k=0) == float("inf")
+
+    # Combined from the wall-free fields of both ends
+    escape_map = EscapeMap(grid)
+    escape_map.distance_field((0, 3), k=0)
+    escape_map.distance_field((2, 2), k=0)
+    assert escape_map.shortest_path((0, 3), (2, 2)) == 4
+    assert len(escape_map._fields) == 2
+
+    # Wall at an end: the same answer whatever is cached
+    escape_map = EscapeMap([[0, 1, 1], [0, 0, 0]])
+    assert escape_map.shortest_path((0, 0), (0, 2)) == 5
+    escape_map.distance_field((0, 0), k=0)
+    escape_map.distance_field((0, 2), k=0)
+    assert escape_map.shortest_path((0, 0), (0, 2)) == 5
+    escape_map.distance_field((0, 2), k=1)
+    assert escape_map.shortest_path((0, 0), (0, 2)) == 5
+
     print("All tests passed")
@@ -1,3 +1,207 @@
+def count_staircases(n, modulus=None):
+    """
+    Number of staircases (at least 2 steps, strictly decreasing heights)
+    that can be built with exactly n bricks, optionally modulo `modulus`.
+    See `solution` for the recurrence.
+    """
+    # steps[s]: staircases of s bricks with exactly k steps (k = 0: only s = 0)
+    prev_steps = [1] + [0] * n
+    total = 0
+    k = 1
+    while k * (k + 1) // 2 <= n:
+        steps = [0] * (n + 1)
+        # f(k, s) only depends on entries k bricks back, so each run of k
+        # consecutive sums can be computed at once
+        for start in range(k * (k + 1) // 2, n + 1, k):
+            end = min(start + k, n + 1)
+            if modulus is None:
+                steps[start:end] = [
+                    a + b for a, b in zip(steps[start - k:end - k], prev_steps[start - k:end - k])
+                ]
+            else:
+                steps[start:end] = [
+                    (a + b) % modulus for a, b in zip(steps[start - k:end - k], prev_steps[start - k:end - k])
+                ]
+
+        # Single-step staircases (all bricks stacked) don't count
+        if k >= 2:
+            total += steps[n]
+        prev_steps = steps
+        k += 1
+
+    return total if modulus is None else total % modulus
+
+# Process-wide table of q(n): the number of ways of writing n as a sum of
+# distinct positive integers (staircases, plus the single-step one)
+_distinct_partitions = [1]
+# Generalized pentagonal numbers j(3j-1)/2 and j(3j+1)/2, for j = 1, 2, ...,
+# split by the sign (-1)^(j+1) they take in the recurrence of q(n)
+_pentagonal_plus = []
+_pentagonal_minus = []
+_pentagonal_signs = {0: 1}     # generalized pentagonal number -> (-1)^j
+
+def distinct_partitions_table(n):
+    """
+    Returns the process-wide table of q(0..m), m >= n, growing it as needed.
+
+    Euler's pentagonal number theorem gives prod(1 + x^k) * prod(1 - x^k) =
+    prod(1 - x^2k), i.e., a recurrence where each new entry costs O(sqrt(n)):
+
+        q(n) = a(n) + sum_{j >= 1} (-1)^(j+1) [q(n - j(3j-1)/2) + q(n - j(3j+1)/2)]
+
+    where a(n) = (-1)^j if n = 2 * (a generalized pentagonal number of index
+    j), and 0 otherwise. So growing from m to n costs O((n - m) * sqrt(n)),
+    and repeated queries are amortized O(1).
+    """
+    table = _distinct_partitions
+    if n < len(table):
+        return table
+
+    # Pentagonal numbers up to n
+    j = (len(_pentagonal_plus) + len(_pentagonal_minus)) // 2 + 1
+    while (j * (3 * j - 1)) // 2 <= n:
+        offsets = _pentagonal_plus if j % 2 else _pentagonal_minus
+        for pentagonal in ((j * (3 * j - 1)) // 2, (j * (3 * j + 1)) // 2):
+            offsets.append(pentagonal)
+            _pentagonal_signs[pentagonal] = -1 if j % 2 else 1
+        j += 1
+
+    num_plus = num_minus = 0
+    for m in range(len(table), n + 1):
+        while num_plus < len(_pentagonal_plus) and _pentagonal_plus[num_plus] <= m:
+            num_plus += 1
+        while num_minus < len(_pentagonal_minus) and _pentagonal_minus[num_minus] <= m:
+            num_minus += 1
+
+        q_m = sum([table[m - g] for g in _pentagonal_plus[:num_plus]])
+        q_m -= sum([table[m - g] for g in _pentagonal_minus[:num_minus]])
+        if m % 2 == 0:
+            q_m += _pentagonal_signs.get(m // 2, 0)
+        table.append(q_m)
+
+    return table
+
+def solution_many(ns):
+    """
+    Answers `solution(n)` for every n in ns, from the process-wide table
+    (grown once, up to max(ns)).
+    """
+    ns = list(ns)
+    if not ns:
+        return []
+    table = distinct_partitions_table(max(ns))
+    # Remove the staircase where we have a single step (all n bricks stacked)
+    return [table[n] - 1 if n > 0 else 0 for n in ns]
+
+def _first_step_counts(bricks, bound):
+    """
+    Yields (step, count) for step = 1, 2, ... below min(bound, bricks + 1):
+    the number of sums of `bricks` in distinct parts whose largest part is
+    step, i.e., of sums of s = bricks - step in distinct parts below step.
+
+    When 2 * step > s, a sum of s in distinct parts has at most one part
+    p >= step, and q(s - p) sums have it, so the count is q(s) minus
+    q(0) + ... + q(s - step), from the process-wide table. Below that,
+    steps come in order, so a single row of counts (sums in distinct parts
+    < step) is carried along, adding one part per step: O(bricks) memory.
+    """
+    table = distinct_partitions_table(bricks)
+    # prefix[i] = q(0) + ... + q(i - 1)
+    prefix = [0]
+    for count in table[:bricks + 1]:
+        prefix.append(prefix[-1] + count)
+
+    row = [1] + [0] * bricks
+    for step in range(1, min(bound, bricks + 1)):
+        left = bricks - step
+        if 2 * step > left:
+            yield step, table[left] - prefix[max(left - step + 1, 0)]
+        else:
+            yield step, row[left]
+            if 3 * (step + 1) <= bricks:
+                row[step:] = [a + b for a, b in zip(row[step:], row)]
+
+def _smallest_top_step(bricks):
+    """Smallest p such that steps p, p-1, ..., 1 hold at least `bricks` bricks."""
+    p = int(((8 * bricks + 1) ** 0.5 - 1) / 2)
+    while p * (p + 1) // 2 < bricks:
+        p += 1
+    while p > 0 and (p - 1) * p // 2 >= bricks:
+        p -= 1
+    return p
+
+def _complete(steps, bricks):
+    """Appends the lexicographically smallest staircase of `bricks` bricks."""
+    while bricks:
+        p = _smallest_top_step(bricks)
+        steps.append(p)
+        bricks -= p
+    return steps
+
+def rank(staircase):
+    """
+    Position (from 0) of a staircase, given as its strictly decreasing steps,
+    in the lexicographic order of all staircases with the same bricks.
+    """
+    position = 0
+    remaining = sum(staircase)
+    for step in staircase:
+        # Staircases with the same steps so far, but a lower step here
+        for _, count in _first_step_counts(remaining, step):
+            position += count
+        remaining -= step
+    return position
+
+def unrank(n, position):
+    """Staircase at `position` (from 0) in the order of `rank`."""
+    if not 0 <= position < solution(n):
+        raise IndexError("Staircase index out of range")
+
+    steps = []
+    remaining = n
+    bound = n   # The first step can't hold all n bricks
+    while remaining:
+        for step, count in _first_step_counts(remaining, bound):
+            if position < count:
+                break
+            position -= count
+        steps.append(step)
+        remaining -= step
+        bound = step
+    return steps
+
+def staircases(n, start=0, stop=None):
+    """
+    Lazily yields the staircases of n bricks, as lists of strictly decreasing
+    steps, in lexicographic order: from the one at position `start` (see
+    `rank`) up to, but excluding, the one at position `stop`. Each one is
+    derived from the previous one with O(steps) work.
+    """
+    total = solution(n)
+    stop = total if stop is None else min(stop, total)
+    if start >= stop:
+        return
+
+    steps = unrank(n, start)
+    for _ in range(stop - start):
+        yield list(steps)
+
+        # Next staircase: raise the rightmost step that can be raised by one
+        # brick, and complete it with the smallest staircase of what's left
+        suffix_bricks = 0
+        for idx in range(len(steps) - 1, -1, -1):
+            suffix_bricks += steps[idx]
+            raised = steps[idx] + 1
+            left = suffix_bricks - raised
+            if left < 0 or (idx == 0 and left == 0):
+                continue
+            if idx > 0 and raised >= steps[idx - 1]:
+                continue
+            del steps[idx:]
+            steps.append(raised)
+            _complete(steps, left)
+            break
+
 def solution(n):
     """
     Some manually made cases to understand the patterns
@@ -27,38 +231,23 @@ def solution(n):
     from this we can only take `321` since it is the only staircase that starts
     with a degree that is smaller than 5.
     
-    From this information, I could construct the following dp solution:
-    """
+    From this information, I first built an O(n^3) dp over (bricks, first
+    step). A cheaper way to count is by number of steps: a staircase with
+    exactly k steps and n bricks either has a step of 1 brick or not;
+    removing one brick from every step gives, respectively, a staircase with
+    k - 1 steps or one with k steps, in both cases with n - k bricks:
 
-    # Our auxiliary dp matrix consists of a list of size n
-    # 
-    # For each entry, we have another list, where each entry j stores the number
-    # of staircases we can make where the first step is of size j. The second
-    # list is what will allow us to address the previous scenario we analysed of
-    # 4321
-    dp = []
-    for i in range(n + 1):
-        step_counters = [0] * (n + 1)
-        # We are setting the diagonal as 1 as this represent staircases with a
-        # single step (all bricks stacked)
-        # This represents the base cases of our problem
-        step_counters[i] = 1
-        dp.append(step_counters)
-    # When we have 0 bricks, we can't make any staircase
-    dp[0][0] = 0
-
-    # We start at 1 because we can't make staircases with 0 bricks
-    for i in range(1, n + 1):
-        # We start at 1 because it is impossible to make staircases where the
-        # first step has 0 bricks
-        for j in range(1, i + 1):
-            # The staircases with i bricks that start with a step of j bricks are
-            # the ones that can be built with i-j bricks and whose starting step
-            # is smaller then j
-            dp[i][j] += sum(dp[i-j][k] for k in range(j))
+        f(k, n) = f(k, n - k) + f(k - 1, n - k)
+
+    Since k steps need at least k(k+1)/2 bricks, k <= sqrt(2n), and we only
+    need to keep the rows for k - 1 and k: O(n * sqrt(n)) time, O(n) memory
+    (see `count_staircases`).
+
+    Since many n are usually asked for, the answer is actually read from a
+    process-wide table that grows as needed (see `distinct_partitions_table`).
+    """
+    return solution_many([n])[0]
 
-    # Remove the staircase where we have a single step (all n bricks stacked)
-    return sum(dp[n]) - 1
 
 if __name__ == "__main__":
     assert solution(3) == 1
@@ -68,4 +257,14 @@ if __name__ == "__main__":
     assert solution(10) == 9
     # Self made usecases end
     assert solution(200) == 487067745
+    assert count_staircases(200, modulus=1000) == 745
+    assert solution(1) == 0 and solution(2) == 0
+    assert solution_many([10, 3, 200, 0]) == [9, 1, 487067745, 0]
+    assert all(solution(n) == count_staircases(n) for n in range(300))
+
+    assert list(staircases(10)) == [
+        [4, 3, 2, 1], [5, 3, 2], [5, 4, 1], [6, 3, 1], [6, 4], [7, 2, 1], [7, 3], [8, 2], [9, 1]
+    ]
+    assert list(staircases(10, start=4, stop=6)) == [[6, 4], [7, 2, 1]]
+    assert rank([6, 4]) == 4 and unrank(10, 4) == [6, 4]
     print("All tests passed")
\ No newline at end of file
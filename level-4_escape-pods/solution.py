@@ -3,145 +3,416 @@ This is a standard max flow problem.
 
 1. Join all sources with a single artificial source node parent;
 2. Join all sinks with a single artificial sink node child;
-3. Run a max flow algorithm (e.g., Ford-Fulkerson);
+3. Run a max flow algorithm (Dinic, or highest-label push-relabel);
+
+Nodes are integer ids (rooms keep their index, the artificial source and
+sink come after them), and the residual graph is kept in flat lists of
+edges: edge e goes to `to[e]` with residual capacity `cap[e]`, and its
+reverse edge is e ^ 1.
 """
-INF_FLOW = float("+inf")
-
-class Node:
-    def __init__(self, id, edges):  # edges: dict[int, int]
-        self.id = id
-        self.edges = edges  # Dictionary of (destination_node_id -> edge_capacity)
-    
-    def subtract_edge_capacity(self, dest, value):
-        assert dest in self.edges
-        assert self.edges[dest] >= value
-
-        self.edges[dest] -= value
-        if self.edges[dest] == 0:
-            self.edges.pop(dest)
-
-def find_path_dfs(src, dst, all_nodes, visited=None): # -> tuple[list[str], int]:
-    """Runs DFS to find a path from source to destination.
-    We need a "visited" array in case of loops.
-
-    Parameters
-    ----------
-    src : string
-        ID of the source node.
-    dst : string
-        ID of the destination node.
-    all_nodes : dict[string, Node]
-        Dictionary containing all nodes.
-    visited : list[bool], optional
-        Boolean array to save which nodes were already visited.
+from collections import deque
 
-    Returns
-    -------
-    tuple[list[str], int] or None
-        Returns None if no path was found;
-        Else, returns a tuple (path, capacity):
-        - path: the ordered list of node ids;
-        - capacity: the maximum flow that passes through this path
-        (i.e., the edge with lowest capacity);
+# Capacity of the edges from the artificial source and to the artificial sink
+INF_FLOW = 1 << 62
+
+
+class FlowNetwork:
+    def __init__(self, num_nodes):
+        self.num_nodes = num_nodes
+        self.adj = [[] for _ in range(num_nodes)]  # node -> list of edge ids
+        self.to = []    # edge id -> destination node
+        self.cap = []   # edge id -> residual capacity
+        self.capacity = []  # edge id -> capacity (0 for reverse edges)
+
+    def add_edge(self, src, dst, capacity):
+        """Adds edge src -> dst (and its residual reverse edge); returns its id."""
+        edge = len(self.to)
+        self.to += [dst, src]
+        self.cap += [capacity, 0]
+        self.capacity += [capacity, 0]
+        self.adj[src].append(edge)
+        self.adj[dst].append(edge + 1)
+        return edge
+
+    def max_flow(self, src, dst, algorithm="dinic", limit=None):
+        """Pushes as much flow as possible from src to dst, on top of the
+        flow already in the network, and returns the flow that was added.
+
+        Parameters
+        ----------
+        src : int
+            ID of source node.
+        dst : int
+            ID of destination node.
+        algorithm : string, optional
+            "dinic" or "push-relabel" (highest-label, with the gap heuristic).
+        limit : int, optional
+            Stop after pushing this much flow (only supported by "dinic").
+
+        Returns
+        -------
+        int
+            The flow pushed from src to dst.
+        """
+        if algorithm == "dinic":
+            return self._dinic(src, dst, limit)
+        elif limit is not None:
+            raise ValueError("Flow limit is only supported by Dinic's algorithm")
+        elif algorithm == "push-relabel":
+            return self._push_relabel(src, dst)
+        raise ValueError("Unknown max flow algorithm: %s" % algorithm)
+
+    def min_cut(self, src):
+        """Reads the minimum cut off the residual graph, after a max flow
+        from src has been computed (the flow is not re-solved).
+
+        Returns
+        -------
+        tuple[set[int], list[int], list[int]]
+        - source_side: nodes still reachable from src in the residual graph;
+        - cut_edges: ids of the (saturated) edges leaving source_side;
+        - flows: flow on each edge, indexed by edge id // 2;
+        """
+        adj, to, cap, capacity = self.adj, self.to, self.cap, self.capacity
+        reached = [False] * self.num_nodes
+        reached[src] = True
+        queue = deque([src])
+        while queue:
+            node = queue.popleft()
+            for edge in adj[node]:
+                if cap[edge] > 0 and not reached[to[edge]]:
+                    reached[to[edge]] = True
+                    queue.append(to[edge])
+
+        cut_edges = []
+        flows = []
+        for edge in range(0, len(to), 2):
+            flows.append(capacity[edge] - cap[edge])
+            if reached[to[edge ^ 1]] and not reached[to[edge]]:
+                cut_edges.append(edge)
+
+        source_side = set(node for node in range(self.num_nodes) if reached[node])
+        return source_side, cut_edges, flows
+
+    ### Dinic
+    def _bfs_levels(self, src, dst):
+        """Distance (in edges with residual capacity) of each node from src."""
+        adj, to, cap = self.adj, self.to, self.cap
+        level = [-1] * self.num_nodes
+        level[src] = 0
+        queue = deque([src])
+        while queue:
+            node = queue.popleft()
+            next_level = level[node] + 1
+            for edge in adj[node]:
+                if cap[edge] > 0 and level[to[edge]] < 0:
+                    level[to[edge]] = next_level
+                    queue.append(to[edge])
+        return level
+
+    def _blocking_flow(self, src, dst, level, limit):
+        """Saturates every shortest augmenting path in the level graph (or
+        until `limit` flow is pushed), with an iterative DFS that keeps a
+        current-edge pointer per node."""
+        adj, to, cap = self.adj, self.to, self.cap
+        current = [0] * self.num_nodes
+        path = []   # edge ids from src to node
+        node = src
+        total_flow = 0
+
+        while True:
+            if node == dst:
+                path_flow = min(cap[edge] for edge in path)
+                if limit is not None and path_flow > limit - total_flow:
+                    path_flow = limit - total_flow
+                for edge in path:
+                    cap[edge] -= path_flow
+                    cap[edge ^ 1] += path_flow
+                total_flow += path_flow
+                if total_flow == limit:
+                    return total_flow
+
+                # Retreat to the tail of the first saturated edge
+                saturated = 0
+                while cap[path[saturated]] > 0:
+                    saturated += 1
+                del path[saturated:]
+                node = to[path[-1]] if path else src
+                continue
+
+            edges = adj[node]
+            idx = current[node]
+            next_level = level[node] + 1
+            while idx < len(edges):
+                edge = edges[idx]
+                if cap[edge] > 0 and level[to[edge]] == next_level:
+                    break
+                idx += 1
+            current[node] = idx
+
+            if idx < len(edges):    # Advance
+                path.append(edges[idx])
+                node = to[edges[idx]]
+            elif node == src:       # No more augmenting paths
+                return total_flow
+            else:                   # Dead end: retreat, and never come back
+                level[node] = -1
+                node = to[path.pop() ^ 1]
+                current[node] += 1
+
+    def _dinic(self, src, dst, limit=None):
+        total_flow = 0
+        while total_flow != limit:
+            level = self._bfs_levels(src, dst)
+            if level[dst] < 0:
+                break
+            total_flow += self._blocking_flow(
+                src, dst, level, None if limit is None else limit - total_flow
+            )
+        return total_flow
+
+    ### Push-relabel
+    def _global_relabel(self, src, dst, height):
+        """Sets heights to exact residual distances: to dst, or else to src (+n)."""
+        adj, to, cap = self.adj, self.to, self.cap
+        n = self.num_nodes
+        for node in range(n):
+            height[node] = 2 * n
+        for root, base in ((dst, 0), (src, n)):
+            height[root] = base
+            queue = deque([root])
+            while queue:
+                node = queue.popleft()
+                next_height = height[node] + 1
+                for edge in adj[node]:
+                    # Can to[edge] push into node ? (reverse edge has capacity)
+                    prev = to[edge]
+                    if cap[edge ^ 1] > 0 and height[prev] == 2 * n:
+                        height[prev] = next_height
+                        queue.append(prev)
+
+    def _push_relabel(self, src, dst):
+        adj, to, cap = self.adj, self.to, self.cap
+        n = self.num_nodes
+        height = [0] * n
+        excess = [0] * n
+        current = [0] * n
+
+        # Saturate all edges out of the source
+        for edge in adj[src]:
+            flow = cap[edge]
+            if flow > 0:
+                cap[edge] -= flow
+                cap[edge ^ 1] += flow
+                excess[to[edge]] += flow
+                excess[src] -= flow
+
+        def reset_labels():
+            self._global_relabel(src, dst, height)
+            count = [0] * (2 * n + 1)
+            buckets = [[] for _ in range(2 * n + 1)]
+            for node in range(n):
+                count[height[node]] += 1
+                if excess[node] > 0 and node != src and node != dst:
+                    buckets[height[node]].append(node)
+            return count, buckets
+
+        count, buckets = reset_labels()
+        highest = 2 * n
+        relabels = 0
+
+        while highest >= 0:
+            if not buckets[highest]:
+                highest -= 1
+                continue
+            node = buckets[highest].pop()
+            if height[node] != highest or excess[node] == 0:
+                continue    # Stale bucket entry
+
+            # Discharge node
+            edges = adj[node]
+            while excess[node] > 0:
+                if current[node] == len(edges):
+                    # Relabel
+                    old_height = height[node]
+                    new_height = 2 * n
+                    for edge in edges:
+                        if cap[edge] > 0 and height[to[edge]] + 1 < new_height:
+                            new_height = height[to[edge]] + 1
+                    count[old_height] -= 1
+                    height[node] = new_height
+                    count[new_height] += 1
+                    current[node] = 0
+                    relabels += 1
+
+                    # Gap heuristic: nodes above an emptied height can't reach dst
+                    if count[old_height] == 0 and old_height < n:
+                        for other in range(n):
+                            if old_height < height[other] < n:
+                                count[height[other]] -= 1
+                                height[other] = n + 1
+                                count[n + 1] += 1
+                                if excess[other] > 0 and other != src and other != dst:
+                                    buckets[n + 1].append(other)
+                        if height[node] < n + 1:
+                            count[height[node]] -= 1
+                            height[node] = n + 1
+                            count[n + 1] += 1
+                    continue
+
+                edge = edges[current[node]]
+                next_node = to[edge]
+                if cap[edge] > 0 and height[node] == height[next_node] + 1:
+                    # Push
+                    flow = min(excess[node], cap[edge])
+                    cap[edge] -= flow
+                    cap[edge ^ 1] += flow
+                    excess[node] -= flow
+                    if excess[next_node] == 0 and next_node != src and next_node != dst:
+                        buckets[height[next_node]].append(next_node)
+                    excess[next_node] += flow
+                else:
+                    current[node] += 1
+
+            if relabels > n:
+                relabels = 0
+                count, buckets = reset_labels()
+                highest = 2 * n
+            else:
+                highest = max(highest, height[node])
+
+        return excess[dst]
+
+
+def build_network(entrances, exits, path):
+    """
+    Builds the flow network for the given rooms and corridors: rooms keep
+    their index as node id, followed by the artificial source and sink.
+    Returns (network, source, sink).
+    """
+    num_rooms = len(path)
+    source, sink = num_rooms, num_rooms + 1
+    network = FlowNetwork(num_rooms + 2)
+
+    for src, src_paths in enumerate(path):
+        for dest in [dest for dest, capacity in enumerate(src_paths) if capacity > 0]:
+            network.add_edge(src, dest, src_paths[dest])
+
+    # Artificial source to entrances, and exits to artificial sink
+    for entrance in entrances:
+        network.add_edge(source, entrance, INF_FLOW)
+    for exit_node in exits:
+        network.add_edge(exit_node, sink, INF_FLOW)
+
+    return network, source, sink
+
+class IncrementalFlowNetwork:
     """
-    src_node = all_nodes[src]
-    src_edges = src_node.edges
-
-    # Mark source node as visited
-    if visited is None:
-        visited = {node: False for node in all_nodes}
-    visited[src] = True
-
-    for edge, edge_capacity in src_edges.items():
-        # Base case
-        if edge == dst: # Found a path
-            return [dst], edge_capacity
-
-        # Node already explored, skip
-        if visited[edge]:
-            continue
-
-        # Recursive case
-        ret = find_path_dfs(edge, dst, all_nodes, visited)
-        if ret is None: # No path found via edge
-            continue
-        else:           # Path found!
-            path, path_flow = ret
-            return [edge] + path, min(edge_capacity, path_flow)
-    
-    return None # No path to dst node
-
-def ford_fulkerson_max_flow(src, dst, all_nodes):
-    """Runs the Ford-Fulkerson max flow algorithm.
-
-    1. Find a path from source to sink, with all edges carrying
-    positive flow, p;
-    2. Subtract p from all edges of that path, and add p to the
-    total flow;
-    3. Repeat until there are no more paths from source to sink;
-
-    Parameters
-    ----------
-    src : string
-        ID of source node.
-    dst : string
-        ID of destination node.
-    all_nodes : dict[string, Node]
-        Dictionary of node ID to node object.
+    Keeps the max flow of the escape network (and its residual graph) up to
+    date while corridor capacities change, instead of solving from scratch.
+    """
+    def __init__(self, entrances, exits, path, algorithm="dinic"):
+        self.network, self.source, self.sink = build_network(entrances, exits, path)
+
+        # (room, room) -> edge id of the corridor
+        self.corridors = {}
+        for edge in range(0, len(self.network.to), 2):
+            src, dest = self.network.to[edge + 1], self.network.to[edge]
+            if src < self.source and dest < self.source:
+                self.corridors[(src, dest)] = edge
+
+        self.flow = self.network.max_flow(self.source, self.sink, algorithm)
+
+    def set_capacity(self, src, dest, capacity):
+        """
+        Sets the capacity of corridor src -> dest, repairs the current flow,
+        and returns the new max flow.
+
+        If the corridor now carries more flow than its capacity, the excess
+        is first rerouted from src to dest through the residual graph; what
+        can't be rerouted is cancelled back to the source (from src) and to
+        the sink (from dest). Then new augmenting paths are searched for.
+        """
+        network = self.network
+        edge = self.corridors.get((src, dest))
+        if edge is None:
+            edge = self.corridors[(src, dest)] = network.add_edge(src, dest, 0)
+
+        edge_flow = network.capacity[edge] - network.cap[edge]
+        network.capacity[edge] = capacity
+        if capacity >= edge_flow:
+            network.cap[edge] = capacity - edge_flow
+        else:
+            # Drop the edge's flow to its new capacity
+            excess = edge_flow - capacity
+            network.cap[edge] = 0
+            network.cap[edge ^ 1] = capacity
+
+            # src now has `excess` too much incoming flow, and dest too little
+            excess -= network.max_flow(src, dest, limit=excess)
+            if excess:
+                cancelled = network.max_flow(src, self.source, limit=excess)
+                assert cancelled == excess, "Inconsistent residual graph"
+                cancelled = network.max_flow(self.sink, dest, limit=excess)
+                assert cancelled == excess, "Inconsistent residual graph"
+                self.flow -= excess
+
+        self.flow += network.max_flow(self.source, self.sink)
+        return self.flow
+
+    def bottlenecks(self):
+        """
+        Returns (max flow, bottleneck corridors, flow through each corridor,
+        rooms on the entrances' side of the cut) for the current flow.
+        """
+        return (self.flow, ) + corridor_report(self.network, self.source)
+
+
+def corridor_report(network, source):
+    """
+    Translates the min cut of a solved escape network back to rooms.
 
     Returns
     -------
-    int
-        The maximum flow from src to dst.
-    """    
-    total_flow = 0
-
-    while True:
-        # Find path from source to destination
-        ret = find_path_dfs(src, dst, all_nodes)
-        if ret is None: # No more paths found
-            return total_flow
-
-        # Unpack result
-        path, path_flow = ret
-
-        # Subtract flow to current graph
-        curr_node = src
-        for edge_node in path:
-            all_nodes[curr_node].subtract_edge_capacity(edge_node, path_flow)
-            curr_node = edge_node
-
-        # Add this path's flow to the total flow
-        total_flow += path_flow
-    
-    return total_flow   # This is never actually reached
-
-def solution(entrances, exits, path):
+    tuple[list[tuple[int, int]], dict[tuple[int, int], int], list[int]]
+    - the bottleneck corridors (src_room, dest_room) in the min cut;
+    - the flow through each corridor;
+    - the rooms on the entrances' side of the cut;
     """
-    Parse input into a graph structure, and run the Ford-Fulkerson
-    max flow algorithm.
-    """
-    # Build graph structure
-    source = Node(id="source", edges={str(e): INF_FLOW for e in entrances})
-    sink = Node(id="sink", edges={})
+    source_side, cut_edges, flows = network.min_cut(source)
+    to, capacity = network.to, network.capacity
 
-    # all_nodes: dict[str, Node]
-    all_nodes = {
-        source.id: source,
-        sink.id: sink,
-    }
+    def is_corridor(edge):
+        return to[edge] < source and to[edge ^ 1] < source
 
-    for src, src_paths in enumerate(path):
-        node_id = str(src)
-        node_edges = {str(dest): flow for dest, flow in enumerate(src_paths) if flow > 0}
-        all_nodes[node_id] = Node(id=node_id, edges=node_edges)
+    # Corridors closed down to no capacity are not bottlenecks
+    cut = [
+        (to[edge ^ 1], to[edge]) for edge in cut_edges
+        if is_corridor(edge) and capacity[edge] > 0
+    ]
+    corridor_flows = dict(
+        ((to[edge ^ 1], to[edge]), flows[edge // 2])
+        for edge in range(0, len(to), 2) if is_corridor(edge)
+    )
+    rooms = sorted(node for node in source_side if node < source)
+    return cut, corridor_flows, rooms
 
-    # Build edge from exit nodes to new artificial sink
-    for exit_node in exits:
-        node_id = str(exit_node)
-        all_nodes[node_id].edges = {"sink": INF_FLOW}
+def bottlenecks(entrances, exits, path, algorithm="dinic"):
+    """
+    Solves the max flow once, and returns (max flow, bottleneck corridors,
+    flow through each corridor, rooms on the entrances' side of the cut).
+    """
+    network, source, sink = build_network(entrances, exits, path)
+    flow = network.max_flow(source, sink, algorithm)
+    return (flow, ) + corridor_report(network, source)
 
-    return ford_fulkerson_max_flow(source.id, sink.id, all_nodes)
+def solution(entrances, exits, path, algorithm="dinic"):
+    """
+    Parse input into a flow network, and run a max flow algorithm
+    ("dinic" or "push-relabel").
+    """
+    network, source, sink = build_network(entrances, exits, path)
+    return network.max_flow(source, sink, algorithm)
 
 if __name__ == "__main__":
     entrances = [0, 1]
@@ -156,3 +427,19 @@ if __name__ == "__main__":
     ]
 
     assert solution(entrances, exits, path) == 16
+    assert solution(entrances, exits, path, algorithm="push-relabel") == 16
+    assert solution([0], [3], [[0, 7, 0, 0], [0, 0, 6, 0], [0, 0, 0, 8], [9, 0, 0, 0]]) == 6
+    flow, cut, corridor_flows, rooms = bottlenecks(entrances, exits, path)
+    assert flow == 16 and rooms == [0, 1, 2]
+    assert sorted(cut) == [(0, 3), (1, 3), (2, 4), (2, 5)]
+    assert sum(corridor_flows[corridor] for corridor in cut) == 16
+
+    network = IncrementalFlowNetwork(entrances, exits, path)
+    assert network.flow == 16
+    assert network.set_capacity(3, 4, 0) == 14
+    flow, cut, corridor_flows, rooms = network.bottlenecks()
+    assert (3, 4) not in cut and sum(corridor_flows[corridor] for corridor in cut) == 14
+    assert network.set_capacity(0, 3, 1) == 11
+    assert network.set_capacity(0, 5, 3) == 14
+    assert network.set_capacity(3, 4, 6) == 14
+    print("All tests passed")
@@ -1,83 +1,62 @@
-import heapq
-
-def translate_columns(columns):
+try:
+    from math import comb as binomial
+except ImportError:  # Python < 3.8
+    def binomial(n, r):
+        if not 0 <= r <= n:
+            return 0
+        result = 1
+        for i in range(min(r, n - r)):
+            result = result * (n - i) // (i + 1)
+        return result
+
+def worker_keys(num_buns, num_required, worker):
     """
-    Translate the given incidence matrix columns into the actual response.
-    For example, considering the given example of `solution(5, 3)`, we would get
-    the following incidence matrix:
-
-    1111110000
-    1110001110
-    1001101101
-    0101011011
-    0010110111
-
-    which corresponds to the columns:
-    [
-        [1, 1, 1, 0, 0],
-        [1, 1, 0, 1, 0],
-        [1, 1, 0, 0, 1],
-        [1, 0, 1, 1, 0],
-        [1, 0, 1, 0, 1],
-        [1, 0, 0, 1, 1],
-        [0, 1, 1, 1, 0],
-        [0, 1, 1, 0, 1],
-        [0, 1, 0, 1, 1],
-        [0, 0, 1, 1, 1],
-    ]
-
-    which corresponds to the solution:
-    [0, 1, 2, 3, 4, 5],
-    [0, 1, 2, 6, 7, 8],
-    [0, 3, 4, 6, 7, 9],
-    [1, 3, 5, 6, 8, 9],
-    [2, 4, 5, 7, 8, 9]
-
-    The goal in this method is to convert the columns into the solution.
+    Generates the keys of one worker, in increasing order, without building
+    the incidence matrix: key j is held by the workers of the j-th
+    k-combination of the workers in lexicographic order (the j-th column
+    of the incidence matrix).
+
+    The combinations sharing a prefix are contiguous in lexicographic
+    order, so the keys of the worker are runs of consecutive ranks, one
+    per prefix (of workers before it) followed by the worker itself. The
+    prefixes are walked depth-first, in lexicographic order, along with the
+    rank of their first combination (combinatorial number system); only
+    those that can still be completed with the worker are visited, so the
+    time is linear in the output and the memory is O(k).
     """
-    res = []
-
-    for _ in range(len(columns[0])):
-        res.append([])
-
-    for i in range(len(columns[0])):
-        for j in range(len(columns)):
-            if columns[j][i]:
-                res[i].append(j)
-
-    return res
-
-def compute_IM_columns(v, k):
-    """Compute the columns of the incidence matrix with the given parameters"""
+    v = num_buns
+    # Workers holding each key. If only 1 bunny worker is required, that
+    # means that all bunny workers will have to have this key, hence, this
+    # means that k = v.
+    #
+    # On the other hand, if all bunny workers are required (num_buns ==
+    # num_required), then k must be 1, meaning that only 1 bunny worked will
+    # have a given key.
+    k = v + 1 - num_required
+    # Workers available after `worker`, to complete the combinations
+    after = v - 1 - worker
 
-    columns = []
-    # As priority for our heap we are first using the number of 1s and
-    # then the idx. We use the negative on both values because the heap is
-    # ordered in ascending manner and we want the highest number of ones with
-    # highest idx to be processed first
-    stack = [(0, 0, [0] * v)]
+    def viable(x, t):
+        """Whether t workers before x can be completed into a combination
+        holding the worker, picking more workers in [x, worker)."""
+        return max(t, k - 1 - after) <= min(t + worker - x, k - 1)
 
+    # (next candidate worker, number of workers picked, rank of the first
+    # combination starting with the picked workers)
+    stack = [(0, 0, 0)] if viable(0, 0) else []
     while stack:
-        negative_sum_ones, negative_idx, current = heapq.heappop(stack)
-        idx = -negative_idx
-        sum_ones = -negative_sum_ones
-
-        # Skip if it is not possible to get k 1s from the current idx
-        if idx > (v - k + sum_ones):
+        x, t, base = stack.pop()
+        if x == worker:
+            for key in range(base, base + binomial(after, k - 1 - t)):
+                yield key
             continue
 
-        # We are just copying the list but doing it in a python2 friendly way
-        current_1 = current[:]
-        current_1[idx] = 1
-
-        if sum_ones + 1 == k:
-            columns.append(current_1)
-        else:
-            heapq.heappush(stack, (negative_sum_ones - 1, -(idx + 1), current_1))
-
-        heapq.heappush(stack, (negative_sum_ones, -(idx + 1), current[:]))
-
-    return columns
+        # Skip x: every combination picking x, after the same prefix, comes first
+        if viable(x + 1, t):
+            stack.append((x + 1, t, base + binomial(v - 1 - x, k - 1 - t)))
+        # Pick x
+        if viable(x + 1, t + 1):
+            stack.append((x + 1, t + 1, base))
 
 
 def solution(num_buns, num_required):
@@ -90,16 +69,8 @@ def solution(num_buns, num_required):
     the incidence matrix we can then compute the blocks (the actual problem
     solution)
     """
-    v = num_buns
-    # If only 1 bunny worker is required, that means that all bunny workers will
-    # have to have this key, hence, this means that k = v.
-    #
-    # On the other hand, if all bunny workers are required (num_buns ==
-    # num_required), then k must be 1, meaning that only 1 bunny worked will
-    # have a given key.
-    k = v + 1 - num_required
-
-    return translate_columns(compute_IM_columns(v, k))
+    # Each worker's keys are generated directly, see `worker_keys`
+    return [list(worker_keys(num_buns, num_required, worker)) for worker in range(num_buns)]
 
 
 if __name__ == "__main__":
@@ -113,4 +84,14 @@ if __name__ == "__main__":
         [1, 3, 5, 6, 8, 9],
         [2, 4, 5, 7, 8, 9]
     ]
+    # Against the incidence matrix built from every k-combination, in order
+    from itertools import combinations
+    for num_buns in range(1, 10):
+        for num_required in range(1, num_buns + 1):
+            k = num_buns + 1 - num_required
+            columns = list(combinations(range(num_buns), k))
+            assert solution(num_buns, num_required) == [
+                [key for key, column in enumerate(columns) if worker in column]
+                for worker in range(num_buns)
+            ]
     print("All tests passed")
\ No newline at end of file